@@ -1,16 +1,17 @@
 #!/usr/bin/env python3
 
 import argparse
-import hashlib
+import functools
+import logging
 import os
 import re
+import shutil
+import socket
 import sys
+import threading
 import time
-import zipfile
-from urllib.parse import parse_qs, urlparse
 
-import requests
-from packaging.version import parse as parse_version
+logger = logging.getLogger("vsixget")
 
 # Import version from package __init__.py
 try:
@@ -19,6 +20,186 @@ except ImportError:
     # Fallback for when running as script directly
     __version__ = "1.0.0"
 
+# Publisher and extension names: letters, digits, '_' and '-', not starting
+# with a separator
+EXTENSION_ID_RE = re.compile(r"([A-Za-z0-9][\w\-]*)\.([A-Za-z0-9][\w\-]*)")
+
+# (connect, read) timeouts in seconds for marketplace requests. A short connect
+# timeout makes an unreachable marketplace fail fast without a separate probe.
+REQUEST_TIMEOUT = (3, 30)
+
+CONNECTION_ERROR_MESSAGE = (
+    "Error: Cannot reach VS Code marketplace. Please check your internet connection."
+)
+
+# Seconds a cached latest-version lookup stays valid
+VERSION_CACHE_TTL = 10 * 60
+
+# Asset type of the VSIX file in the extensionquery response
+VSIX_ASSET_TYPE = "Microsoft.VisualStudio.Services.VSIXPackage"
+
+# Bytes per megabyte, used for sizes in progress output
+MB = 1024 * 1024
+MB_PER_BYTE = 1.0 / MB
+
+# Block size used when copying the response body to disk. Each read only
+# returns once the whole block has arrived, and a connection dropped mid-read
+# loses the partial block, so this stays small enough for progress updates and
+# resumed downloads to be fine-grained.
+COPY_BUFFER_SIZE = 256 * 1024
+
+# ZIP signatures checked when verifying a downloaded VSIX. The EOCD record is
+# 22 bytes plus a comment of up to 65535 bytes, so it must lie in the last
+# EOCD_SEARCH_SIZE bytes of the file.
+ZIP_LOCAL_HEADER = b"PK\x03\x04"
+ZIP_EOCD_SIGNATURE = b"PK\x05\x06"
+EOCD_RECORD_SIZE = 22
+EOCD_SEARCH_SIZE = EOCD_RECORD_SIZE + 65535
+
+# Socket receive buffer requested for HTTPS connections
+RECEIVE_BUFFER_SIZE = 4 * MB
+
+# HTTP statuses worth retrying, and the backoff between attempts in seconds
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30
+
+# Packages at least this large are downloaded as PARALLEL_PARTS concurrent
+# byte ranges when the server supports them
+PARALLEL_MIN_SIZE = 8 * MB
+PARALLEL_PARTS = 4
+
+# Content-Range of a 206 response: first and last byte, and the full size
+CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+# Minimum number of seconds between progress updates
+PROGRESS_INTERVAL = 0.25
+
+# Shared HTTP session so the version lookup and the download reuse the same
+# keep-alive connection instead of paying a new TCP+TLS handshake each time.
+# It is created on first use so that --help and argument errors never pay for
+# importing requests.
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_http_adapter():
+    """Create the HTTPAdapter used for all HTTPS requests.
+
+    Besides urllib3's default TCP_NODELAY, connections ask for a larger socket
+    receive buffer so a single download stream can keep more data in flight on
+    high-latency links. This applies to direct connections and to connections
+    made through a proxy.
+
+    HTTPS connections that verify against the default CA bundle also share
+    one SSL context with the bundle loaded once. Otherwise urllib3 re-reads
+    the bundle for every new connection, which costs tens of milliseconds
+    before each handshake. The bundle is the same one requests would use
+    (REQUESTS_CA_BUNDLE, CURL_CA_BUNDLE or the certifi default), so the set of
+    trusted certificates does not change. The context is attached per request,
+    including through a proxy, and only when verify is the default and no
+    client certificate is given; anything else gets urllib3's own context, so
+    the shared one is never modified. requests versions without
+    build_connection_pool_key_attributes (before 2.32.2) do not share it.
+    """
+    from requests.adapters import HTTPAdapter
+    from requests.utils import DEFAULT_CA_BUNDLE_PATH
+    from urllib3.connection import HTTPConnection
+    from urllib3.util.ssl_ import create_urllib3_context
+
+    socket_options = HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+    ]
+
+    ca_bundle = (
+        os.environ.get("REQUESTS_CA_BUNDLE")
+        or os.environ.get("CURL_CA_BUNDLE")
+        or DEFAULT_CA_BUNDLE_PATH
+    )
+    ssl_context = None
+    if os.path.isfile(ca_bundle):
+        ssl_context = create_urllib3_context()
+        ssl_context.load_verify_locations(cafile=ca_bundle)
+
+    class SocketOptionsAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            kwargs.setdefault("socket_options", socket_options)
+            super().init_poolmanager(*args, **kwargs)
+
+        def proxy_manager_for(self, proxy, **proxy_kwargs):
+            proxy_kwargs.setdefault("socket_options", socket_options)
+            return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+        def build_connection_pool_key_attributes(self, request, verify, cert=None):
+            host_params, pool_kwargs = super().build_connection_pool_key_attributes(
+                request, verify, cert
+            )
+            if (
+                ssl_context is not None
+                and host_params["scheme"] == "https"
+                and verify in (True, ca_bundle)
+                and not cert
+            ):
+                # The shared context already trusts this bundle
+                pool_kwargs.pop("ca_certs", None)
+                pool_kwargs.pop("ca_cert_dir", None)
+                pool_kwargs["ssl_context"] = ssl_context
+            return host_params, pool_kwargs
+
+        def cert_verify(self, conn, url, verify, cert):
+            super().cert_verify(conn, url, verify, cert)
+            if (
+                ssl_context is not None
+                and getattr(conn, "conn_kw", {}).get("ssl_context") is ssl_context
+            ):
+                # Keep urllib3 from loading the bundle into the shared context
+                # again for every new connection
+                conn.ca_certs = None
+                conn.ca_cert_dir = None
+
+    return SocketOptionsAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+
+
+def get_session():
+    """Return the shared requests session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+
+            session = requests.Session()
+            session.mount("https://", create_http_adapter())
+            session.headers.update(
+                {"User-Agent": f"vsixget/{__version__}", "Accept-Encoding": "gzip"}
+            )
+            _session = session
+    return _session
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """StreamHandler that leaves flushing to the stream's own buffering.
+
+    logging.StreamHandler flushes after every record. Skipping that lets
+    stdout stay line buffered on a terminal and block buffered when output
+    is redirected, so messages are written in a few large writes and flushed
+    at exit.
+    """
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+def setup_logging():
+    """Send vsixget log messages to stdout as plain text."""
+    handler = BufferedStreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -60,52 +241,47 @@ Examples:
     return parser.parse_args()
 
 
+def split_item_name(item_name):
+    """Split and validate a 'publisher.extension' identifier."""
+    match = EXTENSION_ID_RE.fullmatch(item_name)
+    if match:
+        return match.group(1), match.group(2)
+    return None, None
+
+
 def parse_extension_id(extension_id):
     """Parse extension ID from either a URL or publisher.extension format."""
-    if extension_id.startswith(("http://", "https://")):
-        # Parse from URL
-        parsed_url = urlparse(extension_id)
-        query_params = parse_qs(parsed_url.query)
+    if not extension_id.startswith(("http://", "https://")):
+        # Parse from publisher.extension format, the common case
+        return split_item_name(extension_id)
 
-        if "itemName" in query_params:
-            item_name = query_params["itemName"][0]
-            match = re.match(r"([^.]+)\.(.+)", item_name)
-
-            if match:
-                return match.group(1), match.group(2)
-    else:
-        # Parse from publisher.extension format
-        parts = extension_id.split(".", 1)
-        if len(parts) == 2:
-            return parts[0], parts[1]
+    # Parse from URL (imported here since plain IDs never need it)
+    from urllib.parse import parse_qs, urlparse
 
+    item_names = parse_qs(urlparse(extension_id).query).get("itemName")
+    if item_names:
+        return split_item_name(item_names[0])
     return None, None
 
 
-def check_network_connectivity():
-    """Check if we can reach the VS Code marketplace."""
-    print("Checking network connectivity...")
-    try:
-        response = requests.get("https://marketplace.visualstudio.com", timeout=10)
-        return response.status_code == 200
-    except requests.exceptions.RequestException:
-        return False
-
-
 def version_compare(version1, version2):
     """Compare two version strings. Returns True if version1 < version2.
 
     Uses packaging.version.parse for robust version parsing that handles
     pre-releases and follows PEP 440 standards.
     """
+    from packaging.version import parse as parse_version
+
     return parse_version(version1) < parse_version(version2)
 
 
 def check_for_updates():
-    """Check if a newer version of vsixget is available on GitHub."""
+    """Return the newer vsixget version available on GitHub, or None."""
+    import requests
+
     try:
         # Get the latest release from GitHub API
-        response = requests.get(
+        response = get_session().get(
             "https://api.github.com/repos/jeremiah-k/vsixget/releases/latest", timeout=5
         )
         if response.status_code == 200:
@@ -113,272 +289,1010 @@ def check_for_updates():
             latest_version = data.get("tag_name", "").lstrip("v")
 
             if latest_version and version_compare(__version__, latest_version):
-                print(
-                    f"📦 A newer version of vsixget is available: {latest_version} (current: {__version__})"
-                )
-                print("💡 Update with: pipx upgrade vsixget")
-                print()
+                return latest_version
 
     except requests.exceptions.RequestException:
         # Silently fail if we can't check for updates
         pass
+    return None
 
 
-def download_extension(publisher, extension, version, directory):
-    """Download the extension from the marketplace."""
-    # Expand user directory path (handle ~ in paths)
-    directory = os.path.expanduser(directory)
+def start_update_check():
+    """Run check_for_updates in the background so it overlaps the download.
 
-    # Create directory if it doesn't exist
-    os.makedirs(directory, exist_ok=True)
+    Returns a callable that waits for the check and prints the update notice.
+    """
+    result = {}
+
+    def worker():
+        result["latest_version"] = check_for_updates()
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
 
-    # Check network connectivity first
-    if not check_network_connectivity():
-        print(
-            "Error: Cannot reach VS Code marketplace. Please check your internet connection."
+    def report():
+        thread.join()
+        latest_version = result.get("latest_version")
+        if latest_version:
+            logger.info("")
+            logger.info(
+                "📦 A newer version of vsixget is available: %s (current: %s)",
+                latest_version,
+                __version__,
+            )
+            logger.info("💡 Update with: pipx upgrade vsixget")
+
+    return report
+
+
+class DownloadProgress:
+    """Download progress display, safe to update from several threads.
+
+    Progress is printed at most every PROGRESS_INTERVAL seconds rather than on
+    every update, so terminal output does not scale with the file size.
+    """
+
+    def __init__(self, total_size, downloaded_size=0):
+        self.total_size = total_size
+        self.downloaded_size = downloaded_size
+        # Precomputed so each progress line needs no divisions
+        self.total_mb = total_size / MB
+        self.percent_per_byte = 100.0 / total_size if total_size > 0 else 0.0
+        self.next_print = time.monotonic() + PROGRESS_INTERVAL
+        self.lock = threading.Lock()
+
+    def update(self, size):
+        with self.lock:
+            self.downloaded_size += size
+            if self.total_size > 0:
+                now = time.monotonic()
+                if now >= self.next_print:
+                    self.print_progress()
+                    self.next_print = now + PROGRESS_INTERVAL
+
+    def print_progress(self):
+        sys.stdout.write(
+            "\rDownloaded %.2f MB of %.2f MB (%.1f%%)"
+            % (
+                self.downloaded_size * MB_PER_BYTE,
+                self.total_mb,
+                self.downloaded_size * self.percent_per_byte,
+            )
         )
-        return False
+        sys.stdout.flush()
 
-    # Get version information and construct base URL
-    if not version:
-        print("No version specified, fetching latest...")
-        try:
-            # Try to get the latest version information using the extensionquery API
-            api_url = "https://marketplace.visualstudio.com/_apis/public/gallery/extensionquery"
-            headers = {
-                "Content-Type": "application/json",
-                "Accept": "application/json;api-version=3.0-preview.1",
-            }
-            payload = {
-                "filters": [
-                    {
-                        "criteria": [
-                            {"filterType": 7, "value": f"{publisher}.{extension}"}
-                        ]
-                    }
-                ],
-                "flags": 914,
-            }
-            response = requests.post(api_url, json=payload, headers=headers, timeout=30)
-            if response.status_code == 200:
-                data = response.json()
-
-                # Extract nested data with try/except for cleaner error handling
-                actual_version = "latest"
-                try:
-                    versions = data["results"][0]["extensions"][0]["versions"]
-
-                    # Find the first version without a targetPlatform (universal version)
-                    universal_version = next(
-                        (v["version"] for v in versions if "targetPlatform" not in v),
-                        None,
-                    )
+    def finish(self):
+        """Print the final progress line and end it with a newline."""
+        if self.total_size > 0:
+            self.print_progress()
+            sys.stdout.write("\n")
 
-                    if universal_version:
-                        actual_version = universal_version
-                    elif versions:
-                        # Fallback to the first version if no universal version is found
-                        actual_version = versions[0]["version"]
 
-                    print(f"Latest version: {actual_version}")
+class DownloadWriter:
+    """File wrapper that tracks a download as it is written.
 
-                except (KeyError, IndexError, TypeError):
-                    print("Could not determine latest version, using 'latest' in filename")
-            else:
-                print("Could not fetch version information, using 'latest' in filename")
-                actual_version = "latest"
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching version information: {e}")
-            actual_version = "latest"
+    It counts written bytes, updates a DownloadProgress, hashes the body with
+    sha256 (a hashlib object), and keeps the first and last bytes of the body
+    so the VSIX can be verified and hashed without reading the file back from
+    disk. When resuming, sha256, downloaded_size, head and tail are seeded
+    from the bytes already in the file.
+    """
 
-        # Use specific version URL if we detected the version, otherwise use latest
-        if actual_version != "latest":
-            base_url = f"https://marketplace.visualstudio.com/_apis/public/gallery/publishers/{publisher}/vsextensions/{extension}/{actual_version}/vspackage"
+    def __init__(self, file, progress, sha256, downloaded_size=0, head=b"", tail=b""):
+        self.file = file
+        self.progress = progress
+        self.sha256 = sha256
+        self.downloaded_size = downloaded_size
+        self.head = head
+        self.tail = bytearray(tail)
+
+    def write(self, chunk):
+        # The file is unbuffered, so a single write may be short
+        view = memoryview(chunk)
+        while view:
+            view = view[self.file.write(view) :]
+        self.sha256.update(chunk)
+        self.downloaded_size += len(chunk)
+
+        if len(self.head) < len(ZIP_LOCAL_HEADER):
+            self.head += chunk[: len(ZIP_LOCAL_HEADER) - len(self.head)]
+        if len(chunk) >= EOCD_SEARCH_SIZE:
+            self.tail = bytearray(chunk[-EOCD_SEARCH_SIZE:])
         else:
-            base_url = f"https://marketplace.visualstudio.com/_apis/public/gallery/publishers/{publisher}/vsextensions/{extension}/latest/vspackage"
-    else:
-        actual_version = version
-        base_url = f"https://marketplace.visualstudio.com/_apis/public/gallery/publishers/{publisher}/vsextensions/{extension}/{version}/vspackage"
+            self.tail += chunk
+            del self.tail[:-EOCD_SEARCH_SIZE]
 
-    # Construct filename with version
-    filename = f"{publisher}.{extension}-{actual_version}.vsix"
-    filepath = os.path.join(directory, filename)
+        self.progress.update(len(chunk))
+
+
+def read_zip_markers(file_path):
+    """Return the first 4 bytes and the EOCD search window of a file on disk."""
+    file_size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        head = f.read(len(ZIP_LOCAL_HEADER))
+        f.seek(-min(EOCD_SEARCH_SIZE, file_size), os.SEEK_END)
+        tail = f.read()
+    return head, tail
+
+
+def get_version_cache_path():
+    """Return the path of the on-disk latest-version cache."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "vsixget", "versions.json")
+
+
+def load_version_cache():
+    """Load the latest-version cache, returning an empty dict if unavailable."""
+    import json
 
-    # Function to verify the downloaded file is a valid VSIX (ZIP) file
-    def verify_vsix(file_path, expected_size=None):
-        """Verify that the downloaded file is a valid VSIX (ZIP) file with integrity checks."""
+    try:
+        with open(get_version_cache_path(), encoding="utf-8") as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def is_valid_cache_entry(entry):
+    """Check that a latest-version cache entry has the expected field types.
+
+    The cache file may have been edited by hand or written by another
+    version, so anything malformed is treated as a missing entry.
+    """
+    if not isinstance(entry, dict):
+        return False
+    version = entry.get("version")
+    timestamp = entry.get("timestamp")
+    return (
+        isinstance(version, str)
+        and bool(version)
+        and isinstance(timestamp, (int, float))
+        and not isinstance(timestamp, bool)
+        and all(
+            isinstance(entry.get(key), (str, type(None))) for key in ("etag", "source")
+        )
+    )
+
+
+def save_version_cache(cache):
+    """Write the latest-version cache, ignoring errors (the cache is optional)."""
+    import json
+
+    cache_path = get_version_cache_path()
+    temp_path = f"{cache_path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+
+@functools.lru_cache(maxsize=256)
+def fetch_latest_version(publisher, extension):
+    """Look up the latest universal version of an extension.
+
+    Results are memoized in-process and cached on disk for VERSION_CACHE_TTL
+    seconds so repeated runs skip the extensionquery round trip. Once an entry
+    is stale it is revalidated with If-None-Match when the server provided an
+    ETag, so an unchanged result costs no response body. Because the lookup is
+    a POST, a matching ETag may be answered with 412 instead of 304; both mean
+    the cached result is still current.
+
+    Returns (version, package_url), where package_url is the direct URL of the
+    VSIX asset if the response listed one. If the lookup fails, the stale cache
+    entry is used when there is one, otherwise (None, None) is returned.
+    requests.exceptions.ConnectionError propagates if the marketplace cannot be
+    reached at all.
+    """
+    import requests
+    from urllib3.util.request import ACCEPT_ENCODING
+
+    cache_key = f"{publisher}.{extension}"
+    cache = load_version_cache()
+    entry = cache.get(cache_key)
+    if not is_valid_cache_entry(entry):
+        entry = None
+    if entry and time.time() - entry["timestamp"] < VERSION_CACHE_TTL:
+        logger.info("Latest version: %s (cached)", entry["version"])
+        return entry["version"], entry.get("source")
+
+    def fall_back(message):
+        """Return the stale cache entry, if any, after a failed lookup."""
+        if entry:
+            logger.info("%s, using cached version %s", message, entry["version"])
+            return entry["version"], entry.get("source")
+        logger.info("%s, using 'latest' in filename", message)
+        return None, None
+
+    try:
+        # Try to get the latest version information using the extensionquery API
+        api_url = (
+            "https://marketplace.visualstudio.com/_apis/public/gallery/extensionquery"
+        )
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json;api-version=3.0-preview.1",
+            # The JSON compresses well, so offer every encoding urllib3 can
+            # decode here (br and zstd when the compression extra is installed)
+            "Accept-Encoding": ACCEPT_ENCODING,
+        }
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        payload = {
+            "filters": [{"criteria": [{"filterType": 7, "value": cache_key}]}],
+            "flags": 914,
+        }
+        response = get_session().post(
+            api_url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT
+        )
+    except requests.exceptions.ConnectionError:
+        # Let the caller treat an unreachable marketplace as fatal
+        raise
+    except requests.exceptions.RequestException as e:
+        logger.error("Error fetching version information: %s", e)
+        return fall_back("Could not fetch version information")
+
+    if response.status_code in (304, 412) and "If-None-Match" in headers:
+        # Unchanged since the cached lookup; just refresh its timestamp
+        logger.info("Latest version: %s (cached)", entry["version"])
+        entry["timestamp"] = time.time()
+        save_version_cache(cache)
+        return entry["version"], entry.get("source")
+
+    if response.status_code != 200:
+        return fall_back("Could not fetch version information")
+
+    # Extract nested data with try/except for cleaner error handling
+    try:
+        versions = response.json()["results"][0]["extensions"][0]["versions"]
+
+        # Find the first version without a targetPlatform (universal version)
+        latest = next((v for v in versions if "targetPlatform" not in v), None)
+
+        if not latest and versions:
+            # Fallback to the first version if no universal version is found
+            latest = versions[0]
+        latest_version = latest["version"]
+
+        # The VSIX asset URL, which serves the package without the redirect
+        # and transfer encoding of the /vspackage endpoint
+        package_url = next(
+            (
+                f.get("source")
+                for f in latest.get("files", [])
+                if f.get("assetType") == VSIX_ASSET_TYPE
+            ),
+            None,
+        )
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+        latest_version = package_url = None
+
+    if not latest_version:
+        return fall_back("Could not determine latest version")
+
+    logger.info("Latest version: %s", latest_version)
+    cache[cache_key] = {
+        "version": latest_version,
+        "source": package_url,
+        "etag": response.headers.get("etag"),
+        "timestamp": time.time(),
+    }
+    save_version_cache(cache)
+    return latest_version, package_url
+
+
+def has_eocd_record(tail):
+    """Return True if tail ends with a complete end-of-central-directory record.
+
+    tail must be the last bytes of the file. A record matches when its
+    comment-length field accounts exactly for the bytes after it.
+    """
+    index = tail.rfind(ZIP_EOCD_SIGNATURE)
+    while index != -1:
+        if index + EOCD_RECORD_SIZE <= len(tail):
+            comment_length = int.from_bytes(
+                tail[index + EOCD_RECORD_SIZE - 2 : index + EOCD_RECORD_SIZE],
+                "little",
+            )
+            if index + EOCD_RECORD_SIZE + comment_length == len(tail):
+                return True
+        index = tail.rfind(ZIP_EOCD_SIGNATURE, 0, index)
+    return False
+
+
+def is_readable_zip(file_path):
+    """Return True if zipfile can open the file and every entry passes its CRC check."""
+    import zipfile
+    import zlib
+
+    try:
+        with zipfile.ZipFile(file_path, "r") as zip_ref:
+            return zip_ref.testzip() is None
+    except (zipfile.BadZipFile, OSError, EOFError, NotImplementedError, zlib.error):
+        return False
+
+
+def safe_unlink(file_path):
+    """Remove a file, ignoring it if it does not exist."""
+    try:
+        os.unlink(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def parse_content_range(value):
+    """Parse a Content-Range header into (start, end, total), or return None.
+
+    total is None when the server reports the full size as unknown.
+    """
+    match = CONTENT_RANGE_RE.fullmatch((value or "").strip())
+    if not match:
+        return None
+    start, end, total = match.groups()
+    return int(start), int(end), None if total == "*" else int(total)
+
+
+def get_range_validator(headers):
+    """Return the value to send as If-Range for a response, or None.
+
+    If-Range needs a strong ETag; Last-Modified is used when there is none.
+    """
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("last-modified")
+
+
+def ranged_download_size(headers):
+    """Return the package size if it can be fetched in byte ranges, else 0.
+
+    Used both for parallel parts and for resuming a single stream. The body
+    must be unencoded so byte offsets match the file, the server must accept
+    byte ranges, and there must be a validator so that every range comes from
+    the same version of the file.
+    """
+    if (
+        headers.get("content-encoding", "identity").lower() != "identity"
+        or headers.get("accept-ranges", "").lower() != "bytes"
+        or not get_range_validator(headers)
+    ):
+        return 0
+    try:
+        return int(headers.get("content-length", 0))
+    except ValueError:
+        return 0
+
+
+def pwrite_all(fd, data, offset):
+    """Write all of data at offset, looping over short writes."""
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def preallocate(fd, size):
+    """Reserve disk space for a download of known size, where supported."""
+    if hasattr(os, "posix_fallocate"):
         try:
-            # Check if file exists and is not empty
-            if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
-                print("Error: Downloaded file is empty or does not exist.")
-                return False
-
-            # Check file size if expected size is provided (allow some tolerance for compression)
-            if expected_size is not None:
-                actual_size = os.path.getsize(file_path)
-                # Allow 10% tolerance for size differences due to compression/headers
-                tolerance = max(expected_size * 0.1, 1024)  # At least 1KB tolerance
-                if abs(actual_size - expected_size) > tolerance:
-                    print(f"Warning: File size differs significantly. Expected {expected_size}, got {actual_size}")
-                    # Don't fail on size mismatch, just warn - the ZIP integrity check is more important
-
-            # Try to open the file as a ZIP archive and test integrity
-            with zipfile.ZipFile(file_path, "r") as zip_ref:
-                # Test ZIP file integrity
-                if zip_ref.testzip() is not None:
-                    print("Error: Downloaded VSIX file is corrupted.")
-                    return False
-                # Try to read the file list to verify it's a valid ZIP
-                zip_ref.namelist()
-            return True
-        except zipfile.BadZipFile:
-            print("Error: Downloaded file is not a valid VSIX (ZIP) file.")
-            return False
-        except OSError as e:
-            print(f"Error verifying file: {e}")
-            return False
+            os.posix_fallocate(fd, 0, size)
+        except OSError:
+            # Not supported by every filesystem; writes still work without it
+            pass
+
 
-    def calculate_sha256(file_path):
-        """Calculate SHA-256 hash of a file."""
-        sha256_hash = hashlib.sha256()
+def drop_page_cache(file_path):
+    """Hint the kernel that cached pages of a finished download can be dropped.
+
+    The VSIX is not read again by this process, so there is no reason to keep
+    it in the page cache. Does nothing where posix_fadvise is unavailable.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
         try:
-            with open(file_path, "rb") as f:
-                # Read file in chunks to handle large files efficiently
-                for chunk in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(chunk)
-            return sha256_hash.hexdigest()
-        except OSError as e:
-            print(f"Error calculating file hash: {e}")
-            return None
-
-    # Function to download with retry logic and better progress reporting
-    def download_file_with_retry(url, output_path, max_attempts=3):
-        """Download a file with retry logic and improved progress reporting."""
-        print("Trying universal package...")
-        print(f"URL: {url}")
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    import email.utils
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def wait_before_retry(attempt, max_attempts, retry_after=None):
+    """Sleep before the next attempt using exponential backoff with jitter.
+
+    A server-provided Retry-After value takes precedence, capped at
+    RETRY_MAX_DELAY like the computed delay.
+    """
+    if attempt < max_attempts:
+        import random
+
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = min(
+                RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)
+            ) * random.uniform(0.5, 1.5)
+        delay = min(delay, RETRY_MAX_DELAY)
+        logger.info("Retrying download in %.1f seconds...", delay)
+        time.sleep(delay)
+
+
+def verify_vsix(file_path, head, tail, downloaded_size, expected_size=None):
+    """Verify that the downloaded bytes form a valid VSIX (ZIP) file.
+
+    head and tail are the first bytes and the last EOCD_SEARCH_SIZE bytes
+    of the download, so the common case needs no disk reads. file_path is
+    only opened with zipfile if the signature check fails. expected_size,
+    when given, must equal downloaded_size exactly.
+    """
+    # Check that something was actually downloaded
+    if downloaded_size == 0:
+        logger.error("Error: Downloaded file is empty.")
+        return False
+
+    # The body is not transfer-encoded, so its size must match exactly;
+    # anything else is a truncated or overlong download
+    if expected_size is not None and downloaded_size != expected_size:
+        logger.error(
+            "Error: Downloaded size does not match. Expected %d, got %d",
+            expected_size,
+            downloaded_size,
+        )
+        return False
 
+    # Check the ZIP structure from the captured bytes: a local file header
+    # at the start and a complete end-of-central-directory record at the
+    # end. Archives that fail this (e.g. with leading or trailing data)
+    # get a full zipfile check before being rejected.
+    if head == ZIP_LOCAL_HEADER and has_eocd_record(tail):
+        return True
+    if is_readable_zip(file_path):
+        return True
+    logger.error("Error: Downloaded file is not a valid VSIX (ZIP) file.")
+    return False
+
+
+def hash_file(file_path):
+    """Return a SHA-256 hash object fed with the contents of a file."""
+    import hashlib
+
+    sha256_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        # Read file in chunks to handle large files efficiently
+        for chunk in iter(lambda: f.read(COPY_BUFFER_SIZE), b""):
+            sha256_hash.update(chunk)
+    return sha256_hash
+
+
+def calculate_sha256(file_path):
+    """Calculate SHA-256 hash of a file."""
+    try:
+        return hash_file(file_path).hexdigest()
+    except OSError as e:
+        logger.error("Error calculating file hash: %s", e)
+        return None
+
+
+def finish_download(temp_path, output_path, file_hash=None):
+    """Report the hash of a verified download and move it into place.
+
+    file_hash is the digest computed while streaming, if any; otherwise
+    the file is read back to hash it.
+    """
+    # Calculate and display file hash for verification
+    if file_hash is None:
+        file_hash = calculate_sha256(temp_path)
+    if file_hash:
+        logger.info("File SHA-256: %s", file_hash)
+
+    # Move the temporary file to the final location
+    os.replace(temp_path, output_path)
+    drop_page_cache(output_path)
+    logger.info("Success! Downloaded to: %s", output_path)
+    return True
+
+
+def probe_existing_download(url, file_path):
+    """Check whether file_path already holds the package at url.
+
+    Sends one HEAD request. The local size must match the unencoded
+    Content-Length and the file must have the ZIP signatures at both ends.
+    Returns (is_complete, final_url), where final_url is the URL after any
+    redirects so the download itself can skip them.
+    """
+    import requests
+
+    try:
+        file_size = os.path.getsize(file_path)
+        response = get_session().head(
+            url,
+            allow_redirects=True,
+            headers={"Accept-Encoding": "identity"},
+            timeout=REQUEST_TIMEOUT,
+        )
+    except (OSError, requests.exceptions.RequestException):
+        return False, url
+    if response.status_code != 200:
+        return False, url
+    try:
+        if (
+            response.headers.get("content-encoding", "identity").lower() != "identity"
+            or int(response.headers.get("content-length", -1)) != file_size
+        ):
+            return False, response.url
+        head, tail = read_zip_markers(file_path)
+    except (OSError, ValueError):
+        return False, response.url
+    return head == ZIP_LOCAL_HEADER and has_eocd_record(tail), response.url
+
+
+def download_parts(
+    first_response, temp_path, total_size, retryable_errors, max_attempts=3
+):
+    """Download a file as PARALLEL_PARTS concurrent byte ranges.
+
+    first_response is the open 200 response that reported the size. Its
+    body supplies the first part, so no extra request is needed to find
+    out whether a parallel download is possible. The other parts are
+    requested from the URL it was redirected to, with If-Range so that all
+    parts come from the same version of the file, and each 206 must cover
+    exactly the requested bytes.
+
+    Each part is written at its own offset in a preallocated file and is
+    retried on its own, resuming from the last byte it received, when it
+    raises one of retryable_errors. If any part fails the others stop, and
+    False is returned.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from contextlib import nullcontext
+
+    import requests
+
+    url = first_response.url
+    validator = get_range_validator(first_response.headers)
+    part_size = -(-total_size // PARALLEL_PARTS)
+    ranges = [
+        (start, min(start + part_size, total_size) - 1)
+        for start in range(0, total_size, part_size)
+    ]
+    progress = DownloadProgress(total_size)
+    cancelled = threading.Event()
+
+    def copy_part(start, end):
+        """Download bytes start..end (inclusive) into the file."""
+        offset = start
+        # The first part is read from the response that is already open
+        first = first_response if start == 0 else None
         for attempt in range(1, max_attempts + 1):
-            print(f"Download attempt {attempt}/{max_attempts}...")
+            if cancelled.is_set():
+                break
+            try:
+                if first is not None:
+                    response_context, first = nullcontext(first), None
+                else:
+                    response_context = get_session().get(
+                        url,
+                        stream=True,
+                        headers={
+                            "Range": f"bytes={offset}-{end}",
+                            "If-Range": validator,
+                            "Accept-Encoding": "identity",
+                        },
+                        timeout=REQUEST_TIMEOUT,
+                    )
+                with response_context as response:
+                    content_range = parse_content_range(
+                        response.headers.get("content-range")
+                    )
+                    if response is not first_response and (
+                        response.status_code != 206
+                        or content_range != (offset, end, total_size)
+                    ):
+                        logger.info(
+                            "Range request for bytes %d-%d was not honoured "
+                            "(status code %d)",
+                            offset,
+                            end,
+                            response.status_code,
+                        )
+                        break
+                    while offset <= end and not cancelled.is_set():
+                        chunk = response.raw.read(
+                            min(COPY_BUFFER_SIZE, end + 1 - offset)
+                        )
+                        if not chunk:
+                            break
+                        pwrite_all(fd, chunk, offset)
+                        offset += len(chunk)
+                        progress.update(len(chunk))
+            except retryable_errors as e:
+                logger.error("Download error: %s", e)
+            except requests.exceptions.RequestException as e:
+                logger.error("Download error: %s", e)
+                break
+            if offset > end or cancelled.is_set():
+                break
+            wait_before_retry(attempt, max_attempts)
+
+        if offset > end:
+            return True
+        # Stop the other parts; the download falls back to a single stream
+        cancelled.set()
+        return False
+
+    def fetch_part(start, end):
+        try:
+            return copy_part(start, end)
+        except BaseException:
+            # A write error in one part must not leave the others running
+            cancelled.set()
+            raise
+
+    try:
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            preallocate(fd, total_size)
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                results = list(executor.map(lambda r: fetch_part(*r), ranges))
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.error("Error writing file: %s", e)
+        return False
+
+    progress.finish()
+    return all(results)
+
+
+def download_file_with_retry(url, output_path, retryable_errors, max_attempts=3):
+    """Download a file with retry logic and improved progress reporting.
+
+    retryable_errors is the tuple of exceptions that count as transient
+    network failures; any other requests error ends the download.
+    """
+    import hashlib
 
-            # Create a temporary file for the download
-            temp_path = f"{output_path}.tmp"
+    import requests
 
+    logger.info("Trying universal package...")
+    logger.info("URL: %s", url)
+
+    temp_path = f"{output_path}.tmp"
+
+    # On the first successful response, a large package from a server that
+    # supports byte ranges is fetched as several concurrent parts; anything
+    # else, and any later attempt, uses a single stream.
+    try_parallel = hasattr(os, "pwrite")
+
+    # Full size and If-Range validator of the file being downloaded, set
+    # when the server supports byte ranges, so that a failed attempt can
+    # resume from the partial temporary file instead of starting over
+    resume_size = 0
+    resume_validator = None
+    for attempt in range(1, max_attempts + 1):
+        logger.info("Download attempt %d/%d...", attempt, max_attempts)
+
+        existing = 0
+        if resume_size > 0 and os.path.exists(temp_path):
+            existing = os.path.getsize(temp_path)
+        if existing == 0:
             # Remove any existing temporary file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            safe_unlink(temp_path)
 
-            try:
-                # Download the file
-                response = requests.get(url, stream=True, timeout=30)
-                print(f"Response status code: {response.status_code}")
+        # A VSIX is already a ZIP, so ask for it without transfer compression
+        headers = {"Accept-Encoding": "identity"}
+        if existing > 0:
+            logger.info("Resuming download from %.2f MB...", existing / MB)
+            headers["Range"] = f"bytes={existing}-"
+            # If the file has changed the server sends all of it (200)
+            # instead of a range to append to the old bytes
+            headers["If-Range"] = resume_validator
 
+        try:
+            # Download the file. The context manager always returns the
+            # connection to the pool (or discards it if the body was not
+            # fully read) so a retry does not leak a socket.
+            with get_session().get(
+                url,
+                stream=True,
+                headers=headers,
+                timeout=REQUEST_TIMEOUT,
+            ) as response:
+                logger.info("Response status code: %d", response.status_code)
+
+                if (
+                    existing > 0
+                    and response.status_code == 206
+                    and parse_content_range(response.headers.get("content-range"))
+                    != (existing, resume_size - 1, resume_size)
+                ):
+                    # Only the rest of the same file can be appended
+                    logger.info("Server sent the wrong range, restarting...")
+                    safe_unlink(temp_path)
+                    resume_size = 0
+                    continue
+                if existing > 0 and response.status_code in (200, 416):
+                    # The range was not honoured or the file changed (200),
+                    # or the range no longer applies (416), so start over
+                    # from the first byte
+                    logger.info("Server did not resume the download, restarting...")
+                    existing = 0
+                    if response.status_code == 416:
+                        safe_unlink(temp_path)
+                        resume_size = 0
+                        continue
+
+                parallel_size = (
+                    ranged_download_size(response.headers)
+                    if try_parallel and response.status_code == 200
+                    else 0
+                )
+                if parallel_size >= PARALLEL_MIN_SIZE:
+                    try_parallel = False
+                    logger.info(
+                        "Downloading %.2f MB in %d parts...",
+                        parallel_size / MB,
+                        PARALLEL_PARTS,
+                    )
+                    safe_unlink(temp_path)
+                    if download_parts(
+                        response, temp_path, parallel_size, retryable_errors
+                    ):
+                        head, tail = read_zip_markers(temp_path)
+                        if verify_vsix(
+                            temp_path, head, tail, parallel_size, parallel_size
+                        ):
+                            return finish_download(temp_path, output_path)
+                    safe_unlink(temp_path)
+                    logger.info(
+                        "Parallel download failed, falling back to a single stream..."
+                    )
+                    continue
                 # Check if the request was successful
-                if response.status_code == 200:
-                    # Get the total file size if available
+                elif response.status_code in (200, 206):
+                    if response.status_code == 200:
+                        resume_size = ranged_download_size(response.headers)
+                        resume_validator = get_range_validator(response.headers)
+                    # Get the total file size if available. For a resumed
+                    # download Content-Length only covers the remainder.
                     total_size = int(response.headers.get("content-length", 0))
-                    downloaded_size = 0
-
-                    # Download with progress indication
-                    with open(temp_path, "wb") as f:
-                        if total_size > 0:
-                            print(f"Downloading {total_size / (1024 * 1024):.2f} MB...")
-
-                        for chunk in response.iter_content(
-                            chunk_size=1024 * 1024
-                        ):  # 1MB chunks
-                            if chunk:
-                                f.write(chunk)
-                                downloaded_size += len(chunk)
-
-                                # Show progress on each chunk
-                                if total_size > 0:
-                                    progress_mb = downloaded_size / (1024 * 1024)
-                                    total_mb = total_size / (1024 * 1024)
-                                    percentage = (downloaded_size / total_size) * 100
-                                    print(
-                                        f"Downloaded {progress_mb:.2f} MB of {total_mb:.2f} MB ({percentage:.1f}%)",
-                                        end="\r",
-                                    )
-
-                    # Add newline after download completes
                     if total_size > 0:
-                        print()
+                        total_size += existing
+
+                    # Download with progress indication. copyfileobj moves the
+                    # body in large blocks instead of iterating small chunks.
+                    # The file is unbuffered since copyfileobj already
+                    # writes in large blocks, and is preallocated when the
+                    # size is known to avoid growing it block by block.
+                    if existing > 0:
+                        head, tail = read_zip_markers(temp_path)
+                        sha256_hash = hash_file(temp_path)
+                    else:
+                        head, tail = b"", b""
+                        sha256_hash = hashlib.sha256()
+                    fd = os.open(
+                        temp_path,
+                        os.O_WRONLY
+                        | os.O_CREAT
+                        | (0 if existing > 0 else os.O_TRUNC)
+                        | getattr(os, "O_BINARY", 0),
+                        0o644,
+                    )
+                    with os.fdopen(fd, "wb", buffering=0) as f:
+                        f.seek(existing)
+                        if hasattr(os, "posix_fadvise"):
+                            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                        if total_size > 0:
+                            logger.info("Downloading %.2f MB...", total_size / MB)
+                            preallocate(fd, total_size)
+
+                        progress = DownloadProgress(total_size, existing)
+                        writer = DownloadWriter(
+                            f, progress, sha256_hash, existing, head, tail
+                        )
+                        response.raw.decode_content = True
+                        try:
+                            shutil.copyfileobj(
+                                response.raw, writer, length=COPY_BUFFER_SIZE
+                            )
+                        finally:
+                            if total_size > 0 and writer.downloaded_size != total_size:
+                                # Drop any preallocated space the body did
+                                # not fill, so the file ends at the last
+                                # byte received and a retry can resume there
+                                f.truncate(writer.downloaded_size)
+
+                    # Show final progress after download completes
+                    progress.finish()
 
                     # Verify the downloaded file with size check
-                    expected_size = total_size if total_size > 0 else None
-                    if verify_vsix(temp_path, expected_size):
-                        # Calculate and display file hash for verification
-                        file_hash = calculate_sha256(temp_path)
-                        if file_hash:
-                            print(f"File SHA-256: {file_hash}")
-
-                        # Move the temporary file to the final location
-                        os.replace(temp_path, output_path)
-                        print(f"Success! Downloaded to: {output_path}")
-                        return True
+                    # A server that ignored the identity request sends
+                    # a Content-Length for the encoded body, which the
+                    # decoded size cannot be compared with
+                    encoding = response.headers.get("content-encoding", "identity")
+                    expected_size = (
+                        total_size
+                        if total_size > 0 and encoding.lower() == "identity"
+                        else None
+                    )
+                    if verify_vsix(
+                        temp_path,
+                        writer.head,
+                        writer.tail,
+                        writer.downloaded_size,
+                        expected_size,
+                    ):
+                        return finish_download(
+                            temp_path, output_path, writer.sha256.hexdigest()
+                        )
                     else:
                         # Remove the invalid file
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
-                        print("Download completed but file verification failed.")
-                        if attempt < max_attempts:
-                            print(f"Retrying download in {attempt} seconds...")
-                            time.sleep(attempt)
+                        safe_unlink(temp_path)
+                        logger.info("Download completed but file verification failed.")
+                        wait_before_retry(attempt, max_attempts)
                         continue
                 else:
-                    print(f"Download failed with status code: {response.status_code}")
+                    logger.info(
+                        "Download failed with status code: %d",
+                        response.status_code,
+                    )
                     if response.text:
-                        print(
-                            f"Response: {response.text[:200]}..."
-                        )  # Print first 200 chars of response
-                    if attempt < max_attempts:
-                        print(f"Retrying download in {attempt} seconds...")
-                        time.sleep(attempt)
+                        # Print first 200 chars of response
+                        logger.info("Response: %s...", response.text[:200])
+                    if response.status_code not in RETRYABLE_STATUS:
+                        # Errors such as 404 will not succeed on retry
+                        logger.error(
+                            "Not retrying: status code %d is not retryable.",
+                            response.status_code,
+                        )
+                        break
+                    wait_before_retry(
+                        attempt,
+                        max_attempts,
+                        response.headers.get("retry-after"),
+                    )
                     continue
 
-            except requests.exceptions.RequestException as e:
-                print(f"Download error: {e}")
-                # Clean up partial download if it exists
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                if attempt < max_attempts:
-                    print(f"Retrying download in {attempt} seconds...")
-                    time.sleep(attempt)
-                continue
-
-        print("All download attempts failed.")
-        return False
+        except retryable_errors as e:
+            if isinstance(e, requests.exceptions.ConnectionError):
+                logger.error(CONNECTION_ERROR_MESSAGE)
+            logger.error("Download error: %s", e)
+            # Keep the partial download; the next attempt resumes from it
+            # if the server supports byte ranges
+            wait_before_retry(attempt, max_attempts)
+            continue
+        except requests.exceptions.RequestException as e:
+            logger.error("Download error: %s", e)
+            logger.error("Not retrying: this error is not retryable.")
+            safe_unlink(temp_path)
+            break
+
+    # Clean up partial download if it exists
+    safe_unlink(temp_path)
+    logger.error("All download attempts failed.")
+    return False
+
+
+def download_extension(publisher, extension, version, directory):
+    """Download the extension from the marketplace."""
+    import requests
+    import urllib3
+
+    # Transient network failures worth retrying. urllib3 errors can be raised
+    # directly while reading the body from response.raw.
+    retryable_errors = (
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+        urllib3.exceptions.HTTPError,
+    )
+
+    # Expand user directory path (handle ~ in paths)
+    directory = os.path.expanduser(directory)
+
+    # Create directory if it doesn't exist
+    os.makedirs(directory, exist_ok=True)
+
+    # Get version information and construct base URL
+    package_url = None
+    if not version:
+        logger.info("No version specified, fetching latest...")
+        try:
+            actual_version, package_url = fetch_latest_version(publisher, extension)
+        except requests.exceptions.ConnectionError:
+            # The lookup is the first request of the run, so a connection
+            # failure here means the marketplace is unreachable. Stop instead
+            # of walking through the download retries.
+            logger.error(CONNECTION_ERROR_MESSAGE)
+            return False
+        actual_version = actual_version or "latest"
+
+        # Use specific version URL if we detected the version, otherwise use latest
+        if actual_version != "latest":
+            base_url = f"https://marketplace.visualstudio.com/_apis/public/gallery/publishers/{publisher}/vsextensions/{extension}/{actual_version}/vspackage"
+        else:
+            base_url = f"https://marketplace.visualstudio.com/_apis/public/gallery/publishers/{publisher}/vsextensions/{extension}/latest/vspackage"
+    else:
+        actual_version = version
+        base_url = f"https://marketplace.visualstudio.com/_apis/public/gallery/publishers/{publisher}/vsextensions/{extension}/{version}/vspackage"
+
+    # Construct filename with version
+    filename = f"{publisher}.{extension}-{actual_version}.vsix"
+    filepath = os.path.join(directory, filename)
+
+    # Skip the transfer if an identical copy is already on disk. The download
+    # then goes straight to the URL the check was redirected to.
+    download_url = package_url or base_url
+    if os.path.exists(filepath):
+        is_complete, download_url = probe_existing_download(download_url, filepath)
+        if is_complete:
+            logger.info("Already downloaded: %s", filepath)
+            return True
 
     # Download universal package only
-    print(
-        f"Attempting to download {publisher}.{extension}{' version ' + version if version else ''}..."
+    logger.info(
+        "Attempting to download %s.%s%s...",
+        publisher,
+        extension,
+        " version " + version if version else "",
     )
 
-    if download_file_with_retry(base_url, filepath):
+    # Prefer the direct asset URL from the version lookup, keeping the
+    # /vspackage endpoint as a fallback
+    if download_file_with_retry(download_url, filepath, retryable_errors):
         return True
+    if package_url:
+        logger.info("Direct package download failed, trying the package endpoint...")
+        if download_file_with_retry(base_url, filepath, retryable_errors):
+            return True
 
     # If we get here, download failed
-    print(
+    logger.error(
         "Error: Failed to download extension. Please check the extension ID and version."
     )
-    print("You might want to try downloading manually from the marketplace.")
+    logger.error("You might want to try downloading manually from the marketplace.")
     return False
 
 
 def main():
     args = parse_args()
+    setup_logging()
 
-    # Check for updates
-    check_for_updates()
-
+    # Validate the input before doing any network I/O
     publisher, extension = parse_extension_id(args.extension_id)
 
     if not publisher or not extension:
-        print("Error: Could not parse publisher and extension from input")
-        print(f"Input was: {args.extension_id}")
-        print("Please use format 'publisher.extension' or a marketplace URL")
+        logger.error("Error: Could not parse publisher and extension from input")
+        logger.error("Input was: %s", args.extension_id)
+        logger.error("Please use format 'publisher.extension' or a marketplace URL")
         sys.exit(1)
 
+    # Check for updates in the background while the download runs
+    report_updates = start_update_check()
+
     # Handle version specification
     version = args.version
     if args.latest:
@@ -389,6 +1303,7 @@ def main():
         version = input("Enter version (leave blank for latest): ")
 
     success = download_extension(publisher, extension, version, args.directory)
+    report_updates()
     sys.exit(0 if success else 1)
 
 